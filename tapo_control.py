@@ -2,7 +2,15 @@
 
 import argparse
 import asyncio
+import contextlib
+import io
+import json
 import os
+import re
+import signal
+import tempfile
+import time
+from typing import Optional
 from tapo import ApiClient
 
 ###############################################################################
@@ -11,251 +19,636 @@ from tapo import ApiClient
 #BASHRC_PATHS = ["/home/test/.bashrc", "/root/.bashrc"]
 BASHRC_PATHS = ["~/.bashrc", "/root/.bashrc"]
 
+# Remembers which P300 owns each nickname, so control_device can skip the full scan
+CACHE_PATH = os.path.expanduser("~/.tapo_nickname_cache.json")
+# Cache entries older than this are ignored and rediscovered by a full scan
+CACHE_MAX_AGE_S = 24 * 60 * 60
+
+# Unix socket used by --daemon / --via-daemon
+DAEMON_SOCKET_PATH = os.path.join(os.getenv("XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}"), "tapo.sock")
+
 
 ###############################################################################
 # 1) Helpers to modify TAPO_P300_IPS in .bashrc files (add/remove)
 ###############################################################################
 
-def add_ip_to_line(original_line: str, new_ip: str) -> (str, bool):
+# Matches an 'export TAPO_P300_IPS="ip1,ip2"' line anywhere in a file's text. The value
+# may be double-quoted, single-quoted or bare; a missing closing quote is tolerated.
+# Leading indentation and a trailing '# comment' are captured so they survive a rewrite.
+_TAPO_RE = re.compile(
+    r'^(?P<indent>[ \t]*)export[ \t]+TAPO_P300_IPS='
+    r'(?:"(?P<double>[^"\n]*)"|\'(?P<single>[^\'\n]*)\'|["\']?(?P<bare>[^"\'\s]*))'
+    r'(?P<comment>[ \t]+#.*)?[ \t]*$',
+    re.M,
+)
+
+# One IP (or hostname) in a comma-separated list, without surrounding whitespace
+_IP_TOKEN = re.compile(r'[^\s,]+')
+
+
+def _parse_ip_set(ip_string: str) -> dict:
     """
-    Given a line like:
-      export TAPO_P300_IPS="192.168.100.120,192.168.100.121"
-    parse out the IPs, add 'new_ip' if not present, and return the updated line.
-    
-    Returns (updated_line, changed_flag).
-      updated_line: the new line (possibly the same if no changes)
-      changed_flag: True if a change was made, otherwise False.
+    Parses "ip1, ip2,,ip1" into an ordered set {"ip1": None, "ip2": None}.
+    A dict keeps insertion order, drops duplicates and gives O(1) membership checks.
     """
-    line = original_line.strip()
+    return dict.fromkeys(_IP_TOKEN.findall(ip_string))
 
-    # e.g., line = export TAPO_P300_IPS="192.168.100.120,192.168.100.121"
-    if not line.startswith("export TAPO_P300_IPS="):
-        return (original_line, False)
 
+def _read_text(bashrc_path: str) -> str:
+    """Returns the contents of 'bashrc_path', or an empty string if it does not exist."""
     try:
-        # Split on '=', then parse what's inside the quotes
-        _, after = line.split("=", 1)  # "export TAPO_P300_IPS", "\"192.168.100.120,192.168.100.121\""
-        after = after.strip()
-        if after.startswith("\"") and after.endswith("\""):
-            ip_string = after[1:-1]  # everything inside quotes
-        else:
-            ip_string = after
+        with open(bashrc_path, "r") as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
 
-        existing_ips = [ip.strip() for ip in ip_string.split(",") if ip.strip()]
 
-        if new_ip not in existing_ips:
-            existing_ips.append(new_ip)
-            new_line = f'export TAPO_P300_IPS="{",".join(existing_ips)}"\n'
-            return (new_line, True)
-        else:
-            # No change needed, IP already present
-            return (original_line, False)
-    except Exception:
-        # If something fails in parsing, just return original line
-        return (original_line, False)
+def _tapo_match_ips(m) -> dict:
+    """Returns the IPs captured by a _TAPO_RE match as an ordered set."""
+    ip_string = next((g for g in m.group("double", "single", "bare") if g is not None), "")
+    return _parse_ip_set(ip_string)
 
 
-def remove_ip_from_line(original_line: str, remove_ip: str) -> (str, bool):
+def _find_tapo_ips(text: str) -> Optional[dict]:
     """
-    Given a line like:
-      export TAPO_P300_IPS="192.168.100.120,192.168.100.231"
-    parse out the IPs, remove 'remove_ip' if present, and return the updated line.
-
-    Returns (updated_line, changed_flag).
-      updated_line: the new line (possibly empty if no IPs remain)
-      changed_flag: True if a change was made, otherwise False
+    Returns the IPs of the last 'export TAPO_P300_IPS=' line in 'text' (the one
+    the shell ends up using) as an ordered set, or None if there is no such line.
     """
-    line = original_line.strip()
+    m = None
+    for m in _TAPO_RE.finditer(text):
+        pass
+    if m is None:
+        return None
+    return _tapo_match_ips(m)
 
-    if not line.startswith("export TAPO_P300_IPS="):
-        return (original_line, False)
 
-    try:
-        _, after = line.split("=", 1)
-        after = after.strip()
-        if after.startswith("\"") and after.endswith("\""):
-            ip_string = after[1:-1]
-        else:
-            ip_string = after
+def _compute_new_ip_set(existing_ips: dict, ip_value: str, mode: str) -> dict:
+    """
+    Returns a copy of 'existing_ips' with 'ip_value' added (mode 'add') or
+    removed (mode 'remove'). If no IPs remain the result is empty, which is
+    rendered as an empty TAPO_P300_IPS="" line.
+    """
+    new_ips = dict(existing_ips)
+    if mode == 'add':
+        new_ips.setdefault(ip_value, None)
+    else:  # mode == 'remove'
+        new_ips.pop(ip_value, None)
+    return new_ips
 
-        existing_ips = [ip.strip() for ip in ip_string.split(",") if ip.strip()]
 
-        if remove_ip in existing_ips:
-            existing_ips.remove(remove_ip)
-            # If no IPs left, let's keep the line but empty, or we could remove it entirely
-            # For clarity, let's keep an empty string
-            new_line = f'export TAPO_P300_IPS="{",".join(existing_ips)}"\n'
-            return (new_line, True)
-        else:
-            # IP not in list, no changes
-            return (original_line, False)
-    except Exception:
-        # If parse fails, return original
-        return (original_line, False)
+def _render_tapo_line(ips) -> str:
+    return f'export TAPO_P300_IPS="{",".join(ips)}"'
 
 
-def ensure_tapo_line_exists(lines):
+def _atomic_write(path: str, text: str):
     """
-    Ensures there's at least one line with 'export TAPO_P300_IPS="' in the lines.
-    If none is found, we add a new blank line 'export TAPO_P300_IPS=""' at the end.
+    Writes 'text' to 'path' in one go via a temp file in the same directory and
+    os.replace(), so an interrupted run never leaves a half-written file behind.
+    Symlinks are followed and the original file's permissions and owner are preserved.
     """
-    found_line = False
-    for line in lines:
-        if line.strip().startswith("export TAPO_P300_IPS="):
-            found_line = True
-            break
-
-    if not found_line:
-        lines.append('export TAPO_P300_IPS=""\n')
-    return lines
+    path = os.path.realpath(path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tapo.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            # New file: same permissions a plain open(path, "w") would give it
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+        else:
+            # e.g. root editing a user's ~/.bashrc must not hand it over to root
+            try:
+                os.chown(tmp_path, st.st_uid, st.st_gid)
+            except PermissionError:
+                pass  # not root: the file can only be ours anyway
+            os.chmod(tmp_path, st.st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
 
 
-def update_bashrc_file(bashrc_path: str, ip_value: str, mode: str) -> bool:
+def _splice_line(bashrc_path: str, ips_line: str, mode: str, text: str) -> bool:
     """
-    Updates a single bashrc file for adding or removing an IP address.
-    mode: 'add' or 'remove'
+    Replaces every 'export TAPO_P300_IPS=' line in 'text', the current contents of
+    'bashrc_path', with 'ips_line' (appending it if there is none) and writes the
+    file if anything changed.
     Returns True if changes were written, otherwise False.
     """
-    changed = False
-    lines = []
+    def _replacement(m):
+        # Keep the indentation (e.g. inside an 'if' block) and trailing comment
+        return f"{m.group('indent')}{ips_line}{m.group('comment') or ''}"
 
-    # Read the file if it exists
-    try:
-        with open(bashrc_path, "r") as f:
-            lines = f.readlines()
-    except FileNotFoundError:
-        lines = []
-
-    # Ensure we have at least one line with "export TAPO_P300_IPS=",
-    # so we can add/remove from that line
-    lines = ensure_tapo_line_exists(lines)
-
-    new_lines = []
-    for line in lines:
-        if mode == 'add':
-            updated_line, was_changed = add_ip_to_line(line, ip_value)
-        else:  # mode == 'remove'
-            updated_line, was_changed = remove_ip_from_line(line, ip_value)
-
-        if was_changed:
-            changed = True
-            new_lines.append(updated_line)
-        else:
-            new_lines.append(line)
+    # One regex scan over the whole buffer instead of a strip()/startswith() per line
+    matches = list(_TAPO_RE.finditer(text))
 
-    if changed:
-        try:
-            with open(bashrc_path, "w") as f:
-                f.writelines(new_lines)
-            print(f"[{mode.upper()}] Updated TAPO_P300_IPS in {bashrc_path}")
-        except Exception as e:
-            print(f"[{mode.upper()}] Error writing to {bashrc_path}: {e}")
-            return False
+    if matches and all(m.group(0) == _replacement(m) for m in matches):
+        print(f"[{mode.upper()}] No changes made to {bashrc_path} (IP list already in desired state).")
+        return False
+
+    if matches:
+        new_text = _TAPO_RE.sub(_replacement, text)
     else:
-        print(f"[{mode.upper()}] No changes made to {bashrc_path} (IP '{ip_value}' might already be in desired state).")
+        separator = "\n" if text and not text.endswith("\n") else ""
+        new_text = f"{text}{separator}{ips_line}\n"
 
-    return changed
+    try:
+        _atomic_write(bashrc_path, new_text)
+        print(f"[{mode.upper()}] Updated TAPO_P300_IPS in {bashrc_path}")
+    except Exception as e:
+        print(f"[{mode.upper()}] Error writing to {bashrc_path}: {e}")
+        return False
+    return True
+
+
+def _editable_bashrc(bashrc_path: str, mode: str) -> bool:
+    """
+    Returns True if 'bashrc_path' exists and we may read and rewrite it.
+    Missing or read-only files (e.g. /root/.bashrc for a normal user) are
+    skipped with a message instead of failing halfway through the update.
+    """
+    if not os.path.isfile(bashrc_path):
+        print(f"[{mode.upper()}] Skipping {bashrc_path}: file does not exist.")
+        return False
+    if not os.access(bashrc_path, os.R_OK | os.W_OK):
+        print(f"[{mode.upper()}] Skipping {bashrc_path}: permission denied.")
+        return False
+    return True
 
 
 def update_bashrc_files(ip_value: str, mode: str):
     """
-    Calls update_bashrc_file(...) for each file in BASHRC_PATHS with the given mode.
+    Adds or removes 'ip_value' in the TAPO_P300_IPS line of every file in BASHRC_PATHS.
     mode can be 'add' or 'remove'.
+    The IP list is read from the first file that defines it and rendered once, then
+    the same line is spliced into every file, so all of them stay in sync.
+    """
+    # '~/.bashrc' and '/root/.bashrc' are the same file when running as root
+    paths = dict.fromkeys(os.path.expanduser(path) for path in BASHRC_PATHS)
+    file_texts = {path: _read_text(path) for path in paths if _editable_bashrc(path, mode)}
+    if not file_texts:
+        print(f"[{mode.upper()}] No editable bashrc file found; nothing was changed.")
+        return
+
+    # Canonical source: the first file that already has a TAPO_P300_IPS line
+    existing_ips = None
+    for path in file_texts:
+        existing_ips = _find_tapo_ips(file_texts[path])
+        if existing_ips is not None:
+            break
+
+    if existing_ips is None and mode == 'remove':
+        # No TAPO_P300_IPS line anywhere: don't add an empty one
+        for path in file_texts:
+            print(f"[{mode.upper()}] No changes made to {path} (IP '{ip_value}' might already be in desired state).")
+        return
+
+    new_ips = _compute_new_ip_set(existing_ips or {}, ip_value, mode)
+    ips_line = _render_tapo_line(new_ips)
+
+    # _splice_line leaves files that already have this exact line untouched
+    for path, text in file_texts.items():
+        _splice_line(path, ips_line, mode, text)
+
+
+async def async_update_bashrc_files(ip_value: str, mode: str):
+    """
+    update_bashrc_files(...) for async callers: the file I/O runs in the default
+    thread pool so a slow (e.g. NFS) home directory does not block the event loop.
+    All files are still updated together, from one canonical IP list.
     """
-    for path in BASHRC_PATHS:
-        update_bashrc_file(path, ip_value, mode)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, update_bashrc_files, ip_value, mode)
 
 
 ###############################################################################
 # 2) Tapo listing & control functionality
 ###############################################################################
 
-async def list_all_devices(client, p300_ips):
-    """Lists all child devices across all given P300 IPs."""
-    for ip_address in p300_ips:
-        print(f"\n=== P300 at {ip_address} ===")
+class TapoSession:
+    """
+    Wraps an ApiClient and keeps one authenticated P300 handler per IP, so the
+    handshake with each strip is done at most once per process.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._strips = {}
+
+    async def strip(self, ip_address):
+        """Returns the (memoized) PowerStripHandler for the P300 at 'ip_address'."""
+        power_strip = self._strips.get(ip_address)
+        if power_strip is None:
+            power_strip = await self.client.p300(ip_address)
+            self._strips[ip_address] = power_strip
+        return power_strip
+
+    def forget(self, ip_address):
+        """Drops the handler for 'ip_address', e.g. after its session went stale."""
+        self._strips.pop(ip_address, None)
+
+
+async def list_all_devices(session, p300_ips):
+    """
+    Lists all child devices across all given P300 IPs.
+    All strips are queried concurrently; each strip's block of output is built in
+    memory and written in one go, in the configured order. Strips that could not
+    be reached are reported together in a final "Warnings:" section.
+    The scan also refreshes the nickname cache, so a following control command
+    can go straight to the right strip.
+    """
+    async def _fetch(ip_address):
         try:
-            power_strip = await client.p300(ip_address)
+            power_strip = await session.strip(ip_address)
             child_device_list = await power_strip.get_child_device_list()
-            if not child_device_list:
-                print("  No child devices found.")
-                continue
-
-            for child in child_device_list:
-                state_str = "ON" if child.device_on else "OFF"
-                print(f"  - Nickname: {child.nickname}")
-                print(f"    Device ID: {child.device_id}")
-                print(f"    State: {state_str}\n")
         except Exception as e:
-            print(f"  Warning: Could not connect to P300 at {ip_address} - {e}")
+            session.forget(ip_address)
+            return (ip_address, False, e, None)
+
+        out = [f"\n=== P300 at {ip_address} ==="]
+        if not child_device_list:
+            out.append("  No child devices found.")
+
+        for child in child_device_list:
+            state_str = "ON" if child.device_on else "OFF"
+            out.append(f"  - Nickname: {child.nickname}")
+            out.append(f"    Device ID: {child.device_id}")
+            out.append(f"    State: {state_str}\n")
+        return (ip_address, True, "\n".join(out), child_device_list)
+
+    results = await asyncio.gather(*(_fetch(ip) for ip in p300_ips))
+
+    for _, ok, block, _ in results:
+        if ok:
+            print(block)
+
+    errors = [(ip_address, e) for ip_address, ok, e, _ in results if not ok]
+    print_connection_warnings(errors)
+
+    refresh_nickname_cache(p300_ips, {ip_address: children for ip_address, ok, _, children in results if ok})
+
+
+def print_connection_warnings(errors):
+    """Prints (ip, exception) pairs as a single "Warnings:" block, if there are any."""
+    if errors:
+        lines = ["Warnings:"]
+        lines.extend(f"  Could not connect to P300 at {ip_address} - {e}" for ip_address, e in errors)
+        print("\n".join(lines))
+
+
+def load_nickname_cache() -> dict:
+    """
+    Loads the nickname cache from CACHE_PATH, e.g.:
+      {"kv260": {"ip": "192.168.100.120", "device_id": "8013...", "updated": 1760468578.0}}
+    Entries not refreshed within CACHE_MAX_AGE_S are dropped.
+    Returns an empty dict if the cache is missing or unreadable.
+    """
+    try:
+        with open(CACHE_PATH, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+
+    oldest = time.time() - CACHE_MAX_AGE_S
+    return {
+        nickname: entry for nickname, entry in cache.items()
+        if isinstance(entry, dict) and isinstance(entry.get("updated"), (int, float))
+        and entry["updated"] >= oldest
+    }
+
+
+def _cache_entry(ip_address, device_id) -> dict:
+    return {"ip": ip_address, "device_id": device_id, "updated": time.time()}
+
+
+def save_nickname_cache(cache: dict):
+    """
+    Writes the nickname cache to CACHE_PATH atomically.
+    """
+    try:
+        _atomic_write(CACHE_PATH, json.dumps(cache, indent=2, sort_keys=True))
+    except OSError as e:
+        print(f"Warning: Could not write nickname cache {CACHE_PATH} - {e}")
+
+
+def refresh_nickname_cache(p300_ips, children_by_ip: dict):
+    """
+    Updates the nickname cache from a full listing: {ip: child_device_list} for
+    the strips in 'p300_ips' that answered.
+    Entries pointing at one of the listed strips are replaced by what that strip
+    actually reported; entries for strips that were not listed are kept.
+    A nickname found on several strips maps to the first one in 'p300_ips' order,
+    matching control_device's scan. Strips after one that did not answer are not
+    cached, since that strip may own the same nicknames.
+    """
+    cache = load_nickname_cache()
+    new_cache = {
+        nickname: entry for nickname, entry in cache.items()
+        if entry.get("ip") not in children_by_ip
+    }
+    listed = set()
+    for ip_address in p300_ips:
+        children = children_by_ip.get(ip_address)
+        if children is None:
+            break
+        for child in children:
+            if child.nickname not in listed:
+                listed.add(child.nickname)
+                new_cache[child.nickname] = _cache_entry(ip_address, child.device_id)
+
+    if new_cache != cache:
+        save_nickname_cache(new_cache)
 
 
-async def control_device(client, p300_ips, child_nickname, action):
+async def wait_for_state(plug, want_on: bool, timeout: float = 2.0):
+    """
+    Polls plug.get_device_info() until it reports device_on == want_on, backing off
+    from 100ms up to 400ms between polls. Returns the last device info, which may
+    still show the old state if 'timeout' seconds pass first.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = 0.1
+    while True:
+        info = await plug.get_device_info()
+        if info.device_on == want_on or loop.time() + delay > deadline:
+            return info
+        await asyncio.sleep(delay)
+        delay = min(delay * 1.5, 0.4)
+
+
+def already_in_state(nickname, action, is_on) -> bool:
+    """Returns True (and says so) if an 'on'/'off' action would not change anything."""
+    if action == "on" and is_on:
+        print(f"'{nickname}' is already ON.")
+        return True
+    elif action == "off" and not is_on:
+        print(f"'{nickname}' is already OFF.")
+        return True
+    return False
+
+
+async def apply_action(plug, nickname, action):
+    """
+    Turns 'plug' on/off, or power-cycles it for 'reset' (off -> wait -> on), then
+    prints the state the device reports.
+    """
+    if action == "reset":
+        # Force power-cycle: off -> wait -> on
+        print(f"Resetting '{nickname}' (off -> on)...")
+        await plug.off()
+        await asyncio.sleep(2)  # wait 2s
+        await plug.on()
+        want_on = True
+    else:
+        # 'on' or 'off'
+        if action == "on":
+            print(f"Turning '{nickname}' ON...")
+            await plug.on()
+        else:  # action == "off"
+            print(f"Turning '{nickname}' OFF...")
+            await plug.off()
+        want_on = action == "on"
+
+    # Print final state, as soon as the device reports it
+    new_info = await wait_for_state(plug, want_on)
+    new_state = "ON" if new_info.device_on else "OFF"
+    print(f"New state for '{nickname}': {new_state}")
+
+
+def _earlier_strip_failed(p300_ips, ip_address, errors) -> bool:
+    """Returns True if a strip before 'ip_address' in 'p300_ips' is among the (ip, exception) 'errors'."""
+    failed = {failed_ip for failed_ip, _ in errors}
+    return any(ip in failed for ip in p300_ips[:p300_ips.index(ip_address)])
+
+
+async def control_device(session, p300_ips, child_nickname, action):
     """
     Search all P300s for a matching child nickname; turn it on/off/reset if found.
     If action is 'reset', forcibly power-cycle the device (off -> wait -> on).
+    If the nickname cache knows the device, only the cached P300 is asked for its
+    child list, and it is used only if the nickname still maps to the cached
+    device ID. Otherwise all strips are probed concurrently; the first strip in
+    'p300_ips' order reporting the nickname wins, the probes of later strips are
+    cancelled and the cache is refreshed, unless an earlier strip could not be reached.
     """
-    found_device = False
+    # (ip, exception) for strips that could not be reached, reported once the lookup is done
+    errors = []
 
-    for ip_address in p300_ips:
+    async def _probe(ip_address):
         try:
-            power_strip = await client.p300(ip_address)
+            power_strip = await session.strip(ip_address)
             child_device_list = await power_strip.get_child_device_list()
-
-            for child in child_device_list:
-                if child.nickname == child_nickname:
-                    # Found a match
-                    found_device = True
-                    print(f"Found device '{child.nickname}' on P300 at {ip_address}.")
-
-                    plug = await power_strip.plug(device_id=child.device_id)
-                    is_on = child.device_on
-
-                    if action == "reset":
-                        # Force power-cycle: off -> wait -> on
-                        print(f"Resetting '{child.nickname}' (off -> on)...")
-                        await plug.off()
-                        await asyncio.sleep(2)  # wait 2s
-                        await plug.on()
-                        await asyncio.sleep(1)  # optional second wait
-                    else:
-                        # 'on' or 'off'
-                        if action == "on" and is_on:
-                            print(f"'{child.nickname}' is already ON.")
-                            return
-                        elif action == "off" and not is_on:
-                            print(f"'{child.nickname}' is already OFF.")
-                            return
-
-                        if action == "on":
-                            print(f"Turning '{child.nickname}' ON...")
-                            await plug.on()
-                        else:  # action == "off"
-                            print(f"Turning '{child.nickname}' OFF...")
-                            await plug.off()
-
-                        await asyncio.sleep(1)  # short wait before final check
-
-                    # Print final state
-                    new_info = await plug.get_device_info()
-                    new_state = "ON" if new_info.device_on else "OFF"
-                    print(f"New state for '{child.nickname}': {new_state}")
-
-                    # Exit after controlling the first matching device
-                    return
         except Exception as e:
-            print(f"Warning: Could not connect to P300 at {ip_address} - {e}")
-
-    if not found_device:
+            session.forget(ip_address)
+            errors.append((ip_address, e))
+            return None
+
+        children = {child.nickname: child for child in child_device_list}
+        child = children.get(child_nickname)
+        if child is None:
+            return None
+        return (ip_address, power_strip, child)
+
+    async def _scan(ips, probed):
+        # All probes run concurrently, but results are taken in config order, so with a
+        # nickname present on several strips the first configured one wins (as before).
+        # We only wait for the strips listed before the first match. 'probed' holds
+        # {ip: _probe() result} for strips already asked, which are not asked again.
+        tasks = {ip: asyncio.create_task(_probe(ip)) for ip in ips if ip not in probed}
+        try:
+            for ip_address in ips:
+                match = probed[ip_address] if ip_address in probed else await tasks[ip_address]
+                if match:
+                    return match
+            return None
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            # Let the cancelled probes unwind before we start talking to the device
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    def _forget_nickname():
+        # The cached location is stale; force a full scan next time
+        if cache.pop(child_nickname, None) is not None:
+            save_nickname_cache(cache)
+
+    cache = load_nickname_cache()
+    cached = cache.get(child_nickname)
+    # _probe() results by IP, so the slow path does not ask the cached strip twice
+    probed = {}
+
+    # 1) Fast path: only ask the strip the cache points at
+    match = None
+    if cached is not None and cached.get("ip") in p300_ips:
+        cached_ip = cached["ip"]
+        probed[cached_ip] = await _probe(cached_ip)
+        if probed[cached_ip] is not None and probed[cached_ip][2].device_id == cached.get("device_id"):
+            match = probed[cached_ip]
+        # Otherwise the nickname is gone or now names another socket: look everywhere,
+        # still honouring config order if that other socket is on the cached strip
+
+    # 2) Slow path: look the nickname up on every strip
+    if match is None:
+        match = await _scan(p300_ips, probed)
+    print_connection_warnings(errors)
+
+    if not match:
+        _forget_nickname()
         print(f"No device with nickname '{child_nickname}' found on any known P300 IP.")
         print("Check your nickname spelling or rename it in the Tapo app.")
+        return
+
+    ip_address, power_strip, child = match
+    print(f"Found device '{child.nickname}' on P300 at {ip_address}.")
+
+    # Only a newly discovered location restarts the entry's CACHE_MAX_AGE_S window.
+    # If a strip listed before this one did not answer, it may own the nickname as well
+    # (and would win once it is back), so this location is not remembered.
+    cached = cache.get(child_nickname) or {}
+    if (not _earlier_strip_failed(p300_ips, ip_address, errors)
+            and (cached.get("ip"), cached.get("device_id")) != (ip_address, child.device_id)):
+        cache[child_nickname] = _cache_entry(ip_address, child.device_id)
+        save_nickname_cache(cache)
+
+    # The child list already tells us the current state: no plug handle needed for a no-op
+    if action != "reset" and already_in_state(child.nickname, action, child.device_on):
+        return
+
+    try:
+        plug = await power_strip.plug(device_id=child.device_id)
+        await apply_action(plug, child.nickname, action)
+    except Exception as e:
+        print(f"Warning: Could not connect to P300 at {ip_address} - {e}")
+        session.forget(ip_address)
+        _forget_nickname()
 
 
 ###############################################################################
-# 3) Main entrypoint / argument parsing
+# 3) Daemon mode: keep the client and per-strip handles warm between commands
 ###############################################################################
 
-async def main():
+async def handle_daemon_command(session, p300_ips, line: str) -> str:
+    """
+    Runs one line-oriented daemon command and returns everything it printed.
+    Commands: 'LIST', 'ON <nickname>', 'OFF <nickname>', 'RESET <nickname>'.
+    """
+    parts = line.strip().split(maxsplit=1)
+    command = parts[0].upper() if parts else ""
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        if command == "LIST" and len(parts) == 1:
+            print("Listing all devices across configured P300 IPs...")
+            await list_all_devices(session, p300_ips)
+        elif command in ("ON", "OFF", "RESET") and len(parts) == 2:
+            await control_device(session, p300_ips, parts[1], command.lower())
+        else:
+            print(f"Error: Unknown daemon command '{line.strip()}'. Use LIST, ON|OFF|RESET <nickname>.")
+    return output.getvalue()
+
+
+async def run_daemon(session, p300_ips):
+    """
+    Serves daemon commands on DAEMON_SOCKET_PATH until interrupted.
+    Each connection sends one command line; the reply is the command's output,
+    terminated by the daemon closing the connection.
+    """
+    # stdout is redirected per command, so commands are run one at a time
+    lock = asyncio.Lock()
+
+    async def _handle(reader, writer):
+        try:
+            line = (await reader.readline()).decode()
+            if not line.strip():
+                return  # liveness probe or empty request
+            async with lock:
+                try:
+                    reply = await handle_daemon_command(session, p300_ips, line)
+                except Exception as e:
+                    # Tell the client instead of closing with an empty reply
+                    reply = f"Error: Daemon failed to run '{line.strip()}' - {e}\n"
+            writer.write(reply.encode())
+            await writer.drain()
+        except ConnectionError:
+            pass  # client went away before reading the reply
+        finally:
+            writer.close()
+            with contextlib.suppress(OSError):
+                await writer.wait_closed()
+
+    if await send_daemon_command(None) is not None:
+        print(f"Error: A daemon is already listening on {DAEMON_SOCKET_PATH}.")
+        return
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(DAEMON_SOCKET_PATH)  # stale socket from a previous run
+
+    # Authenticate with every strip up front
+    await asyncio.gather(*(session.strip(ip) for ip in p300_ips), return_exceptions=True)
+
+    try:
+        server = await asyncio.start_unix_server(_handle, path=DAEMON_SOCKET_PATH)
+        os.chmod(DAEMON_SOCKET_PATH, 0o600)
+    except OSError as e:
+        # e.g. XDG_RUNTIME_DIR unset and no /run/user/$UID (root, containers, cron)
+        print(f"Error: Could not listen on {DAEMON_SOCKET_PATH} - {e}")
+        print("Set XDG_RUNTIME_DIR to a writable directory and try again.")
+        return
+
+    # Stop cleanly (and remove the socket) on Ctrl+C or SIGTERM
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+
+    print(f"Tapo daemon listening on {DAEMON_SOCKET_PATH} (Ctrl+C to stop)...")
+    try:
+        async with server:
+            await stop
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(DAEMON_SOCKET_PATH)
+    print("Tapo daemon stopped.")
+
+
+async def send_daemon_command(line):
+    """
+    Sends one command line to the daemon and returns its reply, or None if no
+    daemon is listening. With line=None it only checks that the daemon is up.
+    """
+    try:
+        reader, writer = await asyncio.open_unix_connection(DAEMON_SOCKET_PATH)
+    except OSError:
+        return None
+
+    try:
+        if line is None:
+            return ""
+        writer.write(f"{line}\n".encode())
+        await writer.drain()
+        return (await reader.read()).decode()
+    finally:
+        writer.close()
+        with contextlib.suppress(OSError):
+            await writer.wait_closed()
+
+
+###############################################################################
+# 4) Main entrypoint / argument parsing
+###############################################################################
+
+def _build_parser() -> argparse.ArgumentParser:
+    """Builds the command-line parser; called once at import time (see _PARSER)."""
     parser = argparse.ArgumentParser(
         description="Control multiple Tapo P300 strips by nickname, list them, add IPs, or remove IPs from .bashrc."
     )
@@ -277,6 +670,16 @@ async def main():
         metavar="OLD_IP",
         help="Remove an IP from TAPO_P300_IPS in ~/.bashrc and /root/.bashrc, then exit."
     )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help=f"Stay running and serve list/on/off/reset commands on {DAEMON_SOCKET_PATH}."
+    )
+    parser.add_argument(
+        "--via-daemon",
+        action="store_true",
+        help="Send the list/on/off/reset command to a running --daemon; falls back to direct mode if none is running."
+    )
     parser.add_argument(
         "child_nickname", 
         nargs="?",
@@ -288,22 +691,41 @@ async def main():
         choices=["on", "off", "reset"],
         help="Desired action: 'on', 'off', or 'reset' (force off->on)."
     )
-    args = parser.parse_args()
+    return parser
+
+
+_PARSER = _build_parser()
+
+
+async def main():
+    args = _PARSER.parse_args()
 
     # Handle the --add case
     if args.add:
         new_ip = args.add.strip()
         print(f"Adding IP '{new_ip}' to environment in {', '.join(BASHRC_PATHS)}...")
-        update_bashrc_files(new_ip, 'add')
+        await async_update_bashrc_files(new_ip, 'add')
         return  # Exit after adding
 
     # Handle the --remove case
     if args.remove:
         rm_ip = args.remove.strip()
         print(f"Removing IP '{rm_ip}' from environment in {', '.join(BASHRC_PATHS)}...")
-        update_bashrc_files(rm_ip, 'remove')
+        await async_update_bashrc_files(rm_ip, 'remove')
         return  # Exit after removing
 
+    # Handle the --via-daemon case
+    if args.via_daemon and (args.list or (args.child_nickname and args.action)):
+        if args.list:
+            command = "LIST"
+        else:
+            command = f"{args.action.upper()} {args.child_nickname}"
+        reply = await send_daemon_command(command)
+        if reply is not None:
+            print(reply, end="")
+            return
+        print(f"No daemon listening on {DAEMON_SOCKET_PATH}; running directly.")
+
     # 1) Read Tapo credentials from environment
     tapo_username = os.getenv("TAPO_USERNAME")
     tapo_password = os.getenv("TAPO_PASSWORD")
@@ -316,27 +738,32 @@ async def main():
     if not p300_ips_str:
         print("Error: Please set TAPO_P300_IPS in your environment, e.g. '192.168.100.120,192.168.100.121'")
         return
-    p300_ips = [ip.strip() for ip in p300_ips_str.split(",") if ip.strip()]
+    p300_ips = list(_parse_ip_set(p300_ips_str))
     if not p300_ips:
         print("Error: No valid IPs found in TAPO_P300_IPS environment variable.")
         return
 
     # 3) Create a Tapo API client (same account for all P300s)
-    client = ApiClient(tapo_username, tapo_password)
+    session = TapoSession(ApiClient(tapo_username, tapo_password))
+
+    # Stay running and serve commands over the Unix socket
+    if args.daemon:
+        await run_daemon(session, p300_ips)
+        return
 
     # 4) If --list is used, just list everything and exit
     if args.list:
         print("Listing all devices across configured P300 IPs...")
-        await list_all_devices(client, p300_ips)
+        await list_all_devices(session, p300_ips)
         return
 
     # 5) Otherwise, we need child_nickname + action
     if not args.child_nickname or not args.action:
-        parser.print_help()
+        _PARSER.print_help()
         return
 
     # 6) Perform the desired on/off/reset action
-    await control_device(client, p300_ips, args.child_nickname, args.action)
+    await control_device(session, p300_ips, args.child_nickname, args.action)
 
 
 if __name__ == "__main__":